@@ -0,0 +1,265 @@
+# Shared helpers for app.py and audio_app.py. The two entry points used to carry
+# copy-pasted versions of everything below, so every fix had to land twice and the
+# embedder/splitter caches were loaded once per file instead of once per process.
+import streamlit as st
+from PyPDF2 import PdfReader
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain.embeddings import OpenAIEmbeddings, HuggingFaceInstructEmbeddings
+from langchain.embeddings.base import Embeddings
+from langchain.vectorstores import FAISS
+from langchain.docstore.in_memory import InMemoryDocstore
+from langchain.docstore.document import Document
+import faiss
+import numpy as np
+from langchain.memory import ConversationBufferMemory
+from langchain.chains import ConversationalRetrievalChain
+from langchain.chat_models import ChatOpenAI
+from langchain.callbacks.base import BaseCallbackHandler
+from htmlTemplates import bot_template, user_template
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import io
+import logging
+import os
+import uuid
+
+log = logging.getLogger(__name__)
+
+# let faiss's batch distance kernels run on every core
+faiss.omp_set_num_threads(os.cpu_count() or 4)
+if "AVX2" not in faiss.get_compile_options():
+    log.warning("faiss compiled without AVX2 kernels - install the avx2 faiss-cpu wheel")
+
+OPEN_AI_BASE = "https://llm.ask.psbodhi.ai/chat-13b-v1/v1"
+OPEN_AI_KEY = "EMPTY"
+MODEL = "askbodhi/chat-13B-v1.0"
+EMBED_MODEL_PATH = "/Users/arfsyed/Documents/Development/eats/eats-recommendation-with-network-1/model_t5"
+CSV_PATH = "/Users/arfsyed/Documents/Development/Hackathon/input_files/lakmeindia-products.csv"
+
+__all__ = ['get_pdf_text', 'get_chunk_text', 'get_vector_store',
+           'get_conversation_chain', 'handle_user_input',
+           'Document', 'EMBED_MODEL_PATH', 'CSV_PATH']
+
+@st.cache_resource
+def _get_llm():
+    # env mutation lives here rather than at import time so merely importing
+    # this module (e.g. from a test) doesn't stomp on the process environment
+    os.environ.setdefault("HUGGINGFACEHUB_API_TOKEN", "")
+    return ChatOpenAI(openai_api_base=OPEN_AI_BASE,
+                      openai_api_key=OPEN_AI_KEY,
+                      model=MODEL,
+                      streaming=True)#,
+                    #  max_tokens = 100)
+
+@st.cache_resource
+def _get_condense_llm():
+    # call-time callbacks reach the question-condense step too, so give it a
+    # non-streaming client - only the answer should hit the placeholder
+    return ChatOpenAI(openai_api_base=OPEN_AI_BASE,
+                      openai_api_key=OPEN_AI_KEY,
+                      model=MODEL)
+
+class _StreamToPlaceholder(BaseCallbackHandler):
+    # paints tokens as they arrive, so perceived latency is time-to-first-token
+    def __init__(self, placeholder):
+        self.placeholder = placeholder
+        self.text = ""
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        # a turn can run the LLM more than once; only the latest run's tokens
+        # should be on screen
+        self.text = ""
+
+    def on_llm_new_token(self, token, **kwargs):
+        self.text += token
+        self.placeholder.markdown(self.text)
+
+class ONNXInstructEmbeddings(Embeddings):
+    # serves query embeddings from a compiled ONNX graph instead of eager PyTorch;
+    # export once with: optimum-cli export onnx --model <t5_path> <t5_path>_onnx
+    # (the T5 export writes encoder_model.onnx/decoder_model.onnx; mean-pooled
+    # embeddings only need the encoder)
+    def __init__(self, path):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+        self.sess = ort.InferenceSession(os.path.join(path, "encoder_model.onnx"),
+                                         providers=["CoreMLExecutionProvider", "CPUExecutionProvider"])
+        self.tok = AutoTokenizer.from_pretrained(path)
+        self._input_names = {i.name for i in self.sess.get_inputs()}
+
+    def _encode(self, texts):
+        vecs = []
+        for i in range(0, len(texts), 64):
+            enc = self.tok(texts[i:i+64], padding=True, truncation=True, return_tensors="np")
+            out = self.sess.run(None, {k: v for k, v in enc.items() if k in self._input_names})[0]
+            # mean-pool over non-padding tokens
+            mask = enc["attention_mask"][..., None]
+            vecs.extend((out * mask).sum(axis=1) / mask.sum(axis=1))
+        return [v.tolist() for v in vecs]
+
+    def embed_documents(self, texts):
+        return self._encode(texts)
+
+    def embed_query(self, text):
+        return self._encode([text])[0]
+
+@st.cache_resource
+def _get_embedder(model_name):
+    # prefer the ONNX export when one sits next to the model dir
+    onnx_path = model_name + "_onnx"
+    if os.path.exists(os.path.join(onnx_path, "encoder_model.onnx")):
+        return ONNXInstructEmbeddings(onnx_path)
+    # load the encoder weights once per Streamlit process, not on every rebuild
+    return HuggingFaceInstructEmbeddings(model_name = model_name)
+
+def _extract_one(pdf_bytes):
+    # PDFium parses in C (and releases the GIL), typically 3-5x faster than PyPDF2
+    try:
+        import pypdfium2 as pdfium
+    except ImportError:
+        pdfium = None
+    if pdfium is not None:
+        pdf = pdfium.PdfDocument(pdf_bytes)
+        return "".join(page.get_textpage().get_text_range() for page in pdf)
+    parts = []
+    # strict=False skips spec-violation checks we don't need for text extraction
+    reader = PdfReader(io.BytesIO(pdf_bytes), strict=False)
+    for page in reader.pages:
+        # extract_text can return None on image-only pages
+        parts.append(page.extract_text() or "")
+    return "".join(parts)
+
+def get_pdf_text(pdf_files):
+
+    # Streamlit's UploadedFile isn't picklable, so pass raw bytes to the workers
+    pdf_bytes = [pdf_file.getvalue() if hasattr(pdf_file, "getvalue") else open(pdf_file, "rb").read()
+                 for pdf_file in pdf_files]
+    # extract_text is CPU bound, so one PDF per core with real processes
+    with ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, 8)) as ex:
+        results = list(ex.map(_extract_one, pdf_bytes))
+    return "".join(results)
+
+@st.cache_resource
+def _get_text_splitter():
+    # token-aware splitting keeps chunks inside the embedder's budget
+    # instead of handing it 1000-char chunks it silently truncates
+    return RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+    chunk_size = 512,
+    chunk_overlap = 64,
+    separators = ["\n\n", "\n", " ", ""]
+    )
+
+def get_chunk_text(text):
+
+    chunks = _get_text_splitter().split_text(text)
+
+    return chunks
+
+
+def get_vector_store(data, cache_key=None):
+
+    # For OpenAI Embeddings
+    # embeddings = OpenAIEmbeddings(openai_api_key=api_key)
+
+    # For Huggingface Embeddings
+    embeddings = _get_embedder(EMBED_MODEL_PATH)
+    # same inputs -> same index; load it from disk instead of re-encoding everything
+    cache_dir = os.path.join(".cache", cache_key) if cache_key else None
+    if cache_dir and os.path.exists(cache_dir):
+        return FAISS.load_local(cache_dir, embeddings)
+    # vectorstore = FAISS.from_documents(data, embedding = embeddings)
+    # from_documents embeds one chunk at a time; encode the whole batch instead.
+    # callers may pass Documents (CSV rows) or plain strings (PDF chunks)
+    docs = [d if isinstance(d, Document) else Document(page_content=d) for d in data]
+    texts = [d.page_content for d in docs]
+    metas = [d.metadata for d in docs]
+    if hasattr(embeddings, "client"):
+        vecs = embeddings.client.encode([[embeddings.embed_instruction, t] for t in texts],
+                                        batch_size=64, show_progress_bar=False, convert_to_numpy=True)
+    else:
+        # ONNX path batches internally
+        vecs = embeddings.embed_documents(texts)
+    # flat L2 scans every stored vector per query; IVF partitions give ~O(sqrt(N)) search
+    # (for >100k vectors switch to faiss.index_factory(d, "IVF1024,PQ32") instead)
+    vecs = np.asarray(vecs, dtype="float32")
+    d = vecs.shape[1]
+    # k-means requires at least nlist training points, so clamp by the corpus size
+    # (a handful of chunks, e.g. one resume PDF, would otherwise crash train())
+    nlist = max(1, min(4096, 4 * int(np.sqrt(len(vecs))), len(vecs)))
+    quantizer = faiss.IndexFlatL2(d)
+    # fp16 storage halves bytes per vector, so the bandwidth-bound scan moves twice as fast;
+    # PQ ("IVF256,PQ16") compresses 32x but needs far more training points than we index here
+    index = faiss.IndexIVFScalarQuantizer(quantizer, d, nlist, faiss.ScalarQuantizer.QT_fp16)
+    index.train(vecs)
+    index.add(vecs)
+    # MMR reconstructs candidate vectors by id, which needs a direct map on IVF
+    # indexes (faiss serializes it, so save_local/load_local caches keep it)
+    index.make_direct_map()
+    index.nprobe = 8
+    vectorstore = FAISS(embedding_function=embeddings.embed_query,
+                        index=index,
+                        docstore=InMemoryDocstore({str(i): Document(page_content=t, metadata=m)
+                                                   for i, (t, m) in enumerate(zip(texts, metas))}),
+                        index_to_docstore_id={i: str(i) for i in range(len(texts))})
+    if cache_dir:
+        vectorstore.save_local(cache_dir)
+    return vectorstore
+
+
+def get_conversation_chain(vector_store):
+
+    # OpenAI Model
+    # llm = ChatOpenAI(openai_api_key=api_key, openai_api_base=api_base, model=model)
+
+    # HuggingFace Model
+    # model_name = "Xenova/LaMini-Flan-T5-783M"
+    # model_name = "google/flan-t5-xxl" # WORKING
+    # model_name = "NousResearch/Llama-2-13b-hf" # NO RESULTS
+    # model_name = "bigscience/T0pp"
+    # llm = HuggingFaceHub(repo_id=model_name, model_kwargs={"temperature":0.5, "max_tokens":100})
+    # llm = HuggingFaceHub("/Users/arfsyed/Downloads/langchain-chatbot-multiple-PDF-master/topp_model/T0pp")
+    # pin one retriever handle per session (refreshed only on index rebuild);
+    # plain similarity search ignores fetch_k, so ask for MMR explicitly and
+    # cap its candidate set so reranking never walks the full corpus
+    st.session_state.retriever = vector_store.as_retriever(search_type="mmr",
+                                                           search_kwargs={"k": 4, "fetch_k": 20})
+    memory = ConversationBufferMemory(memory_key='chat_history', return_messages=True)
+    conversation_chain = ConversationalRetrievalChain.from_llm(
+        llm = _get_llm(),
+        condense_question_llm = _get_condense_llm(),
+        retriever = st.session_state.retriever,
+        memory = memory
+    )
+    # fresh token per chain build; keys the answer cache so a rebuilt index
+    # can never be served answers computed against the old corpus
+    st.session_state.conversation_key = uuid.uuid4().hex
+    return conversation_chain
+
+@st.cache_data(ttl=600, show_spinner=False)
+def _cached_answer(question, history_key, chain_key, _callbacks):
+    # history_key/chain_key only key the cache entry; the chain's memory supplies
+    # the actual history. _callbacks is underscore-prefixed so streamlit skips hashing it.
+    return st.session_state.conversation({'question':question}, callbacks=_callbacks)
+
+def handle_user_input(question):
+
+    placeholder = st.empty()
+    handler = _StreamToPlaceholder(placeholder)
+    # re-asking the same question against the same history skips the whole
+    # retrieval + LLM round trip for ten minutes. st.cache_data is shared across
+    # sessions, so the chain's identity is part of the key - rebuilding the index
+    # (or another user's session) must not serve answers from the old corpus
+    history_key = hashlib.md5(repr(st.session_state.chat_history).encode()).hexdigest()
+    chain_key = st.session_state.get("conversation_key", "")
+    response = _cached_answer(question, history_key, chain_key, [handler])
+    placeholder.empty()
+    # synchronous stdout writes block the script thread, so keep these at debug
+    log.debug("response=%r", response)
+    st.session_state.chat_history = response['chat_history']
+    log.debug("chat_history=%r", st.session_state.chat_history)
+
+    for i, message in enumerate(st.session_state.chat_history):
+        if i % 2 == 0:
+            st.write(user_template.replace("{{MSG}}", message.content), unsafe_allow_html=True)
+        else:
+            st.write(bot_template.replace("{{MSG}}", message.content), unsafe_allow_html=True)